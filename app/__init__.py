@@ -1,15 +1,76 @@
 """Flask application factory."""
 
 import os
+from decimal import Decimal
 
+import orjson
 from flask import Flask, jsonify
+from flask.json.provider import JSONProvider
 from pydantic import ValidationError
 
 import app.database as database
+from app.routes import bp
+
+CORS_HEADERS = [
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Methods", "GET, POST, PATCH, DELETE, OPTIONS"),
+    ("Access-Control-Allow-Headers", "Content-Type"),
+]
+
+
+def _orjson_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """Route jsonify() and request JSON parsing through orjson.
+
+    Naive datetimes are emitted as-is (they are ET wall-clock times, not
+    UTC); aware UTC values get a trailing Z, matching pydantic's output.
+    """
+
+    option = orjson.OPT_UTC_Z
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_orjson_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_orjson_default, option=self.option),
+            mimetype="application/json",
+        )
+
+
+class CORSMiddleware:
+    """Answer preflights and add CORS headers at the WSGI layer.
+
+    OPTIONS requests never reach Flask, so no request context or URL
+    matching is set up for them.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") == "OPTIONS":
+            start_response("204 No Content", [("Content-Length", "0"), *CORS_HEADERS])
+            return [b""]
+
+        def start_response_with_cors(status, headers, exc_info=None):
+            return start_response(status, [*headers, *CORS_HEADERS], exc_info)
+
+        return self.wsgi_app(environ, start_response_with_cors)
 
 
 def create_app(data_dir: str | None = None) -> Flask:
     application = Flask(__name__)
+    application.json = OrjsonProvider(application)
 
     database.DATA_DIR = os.path.abspath(
         data_dir
@@ -18,30 +79,12 @@ def create_app(data_dir: str | None = None) -> Flask:
     )
     os.makedirs(database.DATA_DIR, exist_ok=True)
 
-    from app.routes import bp
-
     application.register_blueprint(bp)
 
     @application.errorhandler(ValidationError)
     def handle_validation_error(exc: ValidationError):
         return jsonify({"error": "validation_error", "details": exc.errors()}), 422
 
-    @application.before_request
-    def handle_options():
-        from flask import request
-        if request.method == "OPTIONS":
-            from flask import make_response
-            resp = make_response("", 204)
-            resp.headers["Access-Control-Allow-Origin"] = "*"
-            resp.headers["Access-Control-Allow-Methods"] = "GET, POST, PATCH, DELETE, OPTIONS"
-            resp.headers["Access-Control-Allow-Headers"] = "Content-Type"
-            return resp
-
-    @application.after_request
-    def add_cors_headers(response):
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PATCH, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
-        return response
+    application.wsgi_app = CORSMiddleware(application.wsgi_app)
 
     return application
@@ -1,29 +1,163 @@
 """Simulation tables and session helpers.
 
 Each SQLite file is an independent simulation stored under DATA_DIR.
-Sessions are created fresh per-operation — no engine caching or
-connection pooling.  Simple and self-contained.
+One engine and one session factory are cached per simulation file and
+reused across requests; each operation gets a fresh session, closed when
+it finishes.
 """
 
+import atexit
 import os
+import threading
 from contextlib import contextmanager
-from datetime import datetime, timezone
+from urllib.parse import quote
+from datetime import datetime, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from zoneinfo import ZoneInfo
 
 from sqlalchemy import (
+    BigInteger,
     Column,
-    DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    case,
     create_engine,
+    event,
+    insert,
 )
-from sqlalchemy.orm import DeclarativeBase, Session, relationship, sessionmaker
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Session,
+    relationship,
+    sessionmaker,
+)
+from sqlalchemy.types import TypeDecorator
 
 # Set once by create_app(); every helper below reads from this.
 DATA_DIR: str = ""
 
+# Per-simulation engine / session factory cache, keyed by sim name.
+_ENGINES: dict[str, Engine] = {}
+_SESSION_FACTORIES: dict[str, sessionmaker] = {}
+_ENGINES_LOCK = threading.Lock()
+
+# Sims whose tables ensure_tables() has already checked in this
+# process; cleared alongside the engine.
+_ENSURED_SIMS: set[str] = set()
+_ENSURE_LOCK = threading.Lock()
+
+# (DATA_DIR st_mtime_ns, sorted sim names, same names as a set) from the
+# last directory scan.
+_LIST_CACHE: tuple[int, list[str], frozenset[str]] | None = None
+
+# Connections per simulation engine: kept open, and extra ones allowed
+# under load before checkouts wait (up to the default 30 s pool timeout).
+_POOL_SIZE = 5
+_POOL_MAX_OVERFLOW = 5
+
+# Applied to every new DBAPI connection.  WAL lets readers run alongside
+# the single writer; synchronous=NORMAL is durable under WAL and saves an
+# fsync per commit.
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class SimulationNotFound(Exception):
+    """Raised when a session is requested for a simulation file that does not exist."""
+
+    def __init__(self, sim_name: str):
+        super().__init__(sim_name)
+        self.sim_name = sim_name
+
+
+# ------------------------------------------------------------------
+# Column types
+# ------------------------------------------------------------------
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Stored datetimes are naive ET wall-clock times, like rule times of day.
+SIMULATION_TZ = ZoneInfo("America/New_York")
+
+
+def to_naive_et(value: datetime) -> datetime:
+    """Convert an aware datetime to naive ET wall-clock time; naive values pass through."""
+    if value.tzinfo is not None:
+        value = value.astimezone(SIMULATION_TZ).replace(tzinfo=None)
+    return value
+
+
+def _to_epoch_micros(value: datetime) -> int:
+    return (to_naive_et(value) - _EPOCH) // _MICROSECOND
+
+
+class EpochMicros(TypeDecorator):
+    """Naive datetime stored as integer microseconds since 1970-01-01.
+
+    Integers compare and index faster than SQLite's ISO-text datetimes and
+    need no string parsing on read.  Aware values are converted to ET
+    before storing; values always come back naive, as they did before.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return _to_epoch_micros(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return _EPOCH + timedelta(microseconds=value)
+
+
+# ------------------------------------------------------------------
+# Money
+# ------------------------------------------------------------------
+#
+# Balance entry amounts are stored as integer minor units (cents for USD)
+# so sums are exact.  The API keeps speaking major units.
+
+DEFAULT_MINOR_UNIT = 100
+CURRENCY_MINOR_UNITS: dict[str, int] = {
+    "JPY": 1,
+    "KRW": 1,
+}
+
+
+def minor_unit(currency: str) -> int:
+    return CURRENCY_MINOR_UNITS.get(currency, DEFAULT_MINOR_UNIT)
+
+
+def to_minor_units(amount, currency: str) -> int:
+    """Convert a major-unit amount (Decimal, float or int) to integer minor units."""
+    scaled = Decimal(str(amount)) * minor_unit(currency)
+    return int(scaled.to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(value: int, currency: str) -> float:
+    return value / minor_unit(currency)
+
+
+def _minor_unit_expr(currency_column):
+    return case(CURRENCY_MINOR_UNITS, value=currency_column, else_=DEFAULT_MINOR_UNIT)
+
 
 # ------------------------------------------------------------------
 # ORM models
@@ -38,8 +172,8 @@ class SimulationMetadata(Base):
     __tablename__ = "simulation_metadata"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    start_datetime = Column(DateTime, nullable=False)
-    end_datetime = Column(DateTime, nullable=False)
+    start_datetime = Column(EpochMicros, nullable=False)
+    end_datetime = Column(EpochMicros, nullable=False)
 
     def __repr__(self) -> str:
         return (
@@ -54,11 +188,17 @@ class Account(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), nullable=False)
     created_at = Column(
-        DateTime, nullable=False, default=lambda: datetime.now(timezone.utc)
+        EpochMicros, nullable=False, default=lambda: datetime.now(timezone.utc)
     )
 
+    # Never loaded by the API; deleting an account lets SQLite's
+    # ON DELETE CASCADE remove its entries in the same DELETE.
     balance_entries = relationship(
-        "BalanceEntry", back_populates="account", cascade="all, delete-orphan"
+        "BalanceEntry",
+        back_populates="account",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
     )
 
     def __repr__(self) -> str:
@@ -67,16 +207,37 @@ class Account(Base):
 
 class BalanceEntry(Base):
     __tablename__ = "balance_entries"
+    __table_args__ = (
+        # Covering index for BalanceLedger._load: each timeline, its opening
+        # SUM(amount) and the rule amounts are read without touching the table.
+        Index("ix_balance_timeline", "account_id", "currency", "effective_time", "rule_id", "amount"),
+        # Match the ORDER BY of /activity and the per-account entry list, so
+        # both read in index order instead of sorting.
+        Index("ix_balance_entries_time", "effective_time", "account_id", "id"),
+        Index("ix_balance_entries_acct_time", "account_id", "effective_time", "id"),
+        # Deleting a rule removes its entries and checks the rule_id foreign
+        # key; both look entries up by rule_id alone.
+        Index("ix_balance_entries_rule", "rule_id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
-    amount = Column(Float, nullable=False)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    amount = Column(BigInteger, nullable=False)  # minor units, see to_minor_units()
     currency = Column(String(16), nullable=False)
     description = Column(Text, nullable=True)
-    effective_time = Column(DateTime, nullable=False)
+    effective_time = Column(EpochMicros, nullable=False)
     rule_id = Column(Integer, ForeignKey("funding_rules.id"), nullable=True)
 
-    account = relationship("Account", back_populates="balance_entries")
+    account = relationship("Account", back_populates="balance_entries", lazy="raise_on_sql")
+
+    @hybrid_property
+    def major_amount(self) -> float:
+        return from_minor_units(self.amount, self.currency)
+
+    @major_amount.inplace.expression
+    @classmethod
+    def _major_amount_expression(cls):
+        return cls.amount * 1.0 / _minor_unit_expr(cls.currency)
 
     def __repr__(self) -> str:
         return (
@@ -98,8 +259,8 @@ class FundingRule(Base):
     target_amount = Column(Float, nullable=False, default=0.0)
     description = Column(String(255), nullable=False, default="")
 
-    target_account = relationship("Account", foreign_keys=[target_account_id])
-    source_account = relationship("Account", foreign_keys=[source_account_id])
+    target_account = relationship("Account", foreign_keys=[target_account_id], lazy="raise_on_sql")
+    source_account = relationship("Account", foreign_keys=[source_account_id], lazy="raise_on_sql")
 
     def __repr__(self) -> str:
         return (
@@ -109,33 +270,127 @@ class FundingRule(Base):
         )
 
 
-def get_balance(session, account_id, timestamp, currency, rule_id=None):
-    """Return the sum of all balance entries for an account/currency at or before a timestamp."""
-    from sqlalchemy import func
-    filters = [
-        BalanceEntry.account_id == account_id,
-        BalanceEntry.currency == currency,
-        BalanceEntry.effective_time <= timestamp,
-    ]
-    if rule_id is not None:
-        filters.append(BalanceEntry.rule_id == rule_id)
+def bulk_insert_balance_entries(session, rows) -> list[int]:
+    """Insert balance entry rows (dicts of column values) in one executemany INSERT.
+
+    Returns the new primary keys, in the same order as ``rows``.
+    """
+    if not rows:
+        return []
+    stmt = insert(BalanceEntry).returning(BalanceEntry.id, sort_by_parameter_order=True)
+    return session.execute(stmt, rows).scalars().all()
+
+
+# ------------------------------------------------------------------
+# Schema migrations
+# ------------------------------------------------------------------
+#
+# Tracked with SQLite's PRAGMA user_version.  Brand-new files are stamped
+# with SCHEMA_VERSION straight away; older files run every migration
+# above their stored version once, when their engine is first created.
+
+
+def _migrate_datetimes_to_epoch_micros(conn, tables: set[str]) -> None:
+    for table, columns in (
+        ("simulation_metadata", ("start_datetime", "end_datetime")),
+        ("accounts", ("created_at",)),
+        ("balance_entries", ("effective_time",)),
+    ):
+        if table not in tables:
+            continue
+        for column in columns:
+            rows = conn.exec_driver_sql(
+                f"SELECT rowid, {column} FROM {table} WHERE typeof({column}) = 'text'"
+            ).all()
+            if rows:
+                conn.exec_driver_sql(
+                    f"UPDATE {table} SET {column} = ? WHERE rowid = ?",
+                    [(_to_epoch_micros(datetime.fromisoformat(value)), rowid) for rowid, value in rows],
+                )
+
+
+def _rebuild_table(conn, table: str, select_columns: dict[str, str]) -> None:
+    """Recreate a table from the current model, copying rows across.
+
+    SQLite cannot change a column's type or constraints in place.
+    ``select_columns`` maps each new column to the SQL expression that
+    reads it from the old table.
+    """
+    old = f"_old_{table}"
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {old}")
+    for (index,) in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (old,),
+    ).all():
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    Base.metadata.tables[table].create(conn)
+    conn.exec_driver_sql(
+        f"INSERT INTO {table} ({', '.join(select_columns)}) "
+        f"SELECT {', '.join(select_columns.values())} FROM {old}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {old}")
+
+
+_BALANCE_ENTRY_COLUMNS = {
+    c: c for c in ("id", "account_id", "amount", "currency", "description", "effective_time", "rule_id")
+}
+
+
+def _migrate_amounts_to_minor_units(conn, tables: set[str]) -> None:
+    if "balance_entries" not in tables:
+        return
+    whens = " ".join(f"WHEN '{ccy}' THEN {unit}" for ccy, unit in CURRENCY_MINOR_UNITS.items())
+    scaled = f"CAST(ROUND(amount * CASE currency {whens} ELSE {DEFAULT_MINOR_UNIT} END) AS INTEGER)"
+    _rebuild_table(conn, "balance_entries", {**_BALANCE_ENTRY_COLUMNS, "amount": scaled})
+
+
+def _migrate_balance_entries_cascade(conn, tables: set[str]) -> None:
+    if "balance_entries" not in tables:
+        return
+    sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'balance_entries'"
+    ).scalar()
+    if "ON DELETE CASCADE" not in sql:
+        _rebuild_table(conn, "balance_entries", _BALANCE_ENTRY_COLUMNS)
+
+
+def _migrate_balance_entry_indexes(conn, tables: set[str]) -> None:
+    if "balance_entries" not in tables:
+        return
+    for index in BalanceEntry.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_merge_balance_lookup_indexes(conn, tables: set[str]) -> None:
+    # ix_balance_timeline replaces both; they shared its leading columns.
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_balance_lookup")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_balance_sum")
+    _migrate_balance_entry_indexes(conn, tables)
 
-    result = session.query(func.coalesce(func.sum(BalanceEntry.amount), 0.0)).filter(*filters).scalar()
-    return result
 
-def get_balance_at_timestamp(session, account_id, timestamp, currency, rule_id=None):
-    """Return the sum of all balance entries for an account/currency at or before a timestamp."""
-    from sqlalchemy import func
-    filters = [
-        BalanceEntry.account_id == account_id,
-        BalanceEntry.currency == currency,
-        BalanceEntry.effective_time == timestamp,
-    ]
-    if rule_id is not None:
-        filters.append(BalanceEntry.rule_id == rule_id)
+_MIGRATIONS = {
+    1: _migrate_datetimes_to_epoch_micros,
+    2: _migrate_amounts_to_minor_units,
+    3: _migrate_balance_entries_cascade,
+    4: _migrate_balance_entry_indexes,
+    5: _migrate_balance_entry_indexes,  # adds ix_balance_entries_rule
+    6: _migrate_merge_balance_lookup_indexes,
+}
+SCHEMA_VERSION = max(_MIGRATIONS)
 
-    result = session.query(func.coalesce(func.sum(BalanceEntry.amount), 0.0)).filter(*filters).scalar()
-    return result
+
+def _migrate(engine: Engine) -> None:
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        if version >= SCHEMA_VERSION:
+            return
+        tables = set(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).scalars())
+        if tables:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                _MIGRATIONS[target](conn, tables)
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
 
 # ------------------------------------------------------------------
@@ -147,71 +402,179 @@ def _sim_path(sim_name: str) -> str:
     return os.path.join(DATA_DIR, f"{sim_name}.db")
 
 
-def _make_engine(sim_name: str):
-    return create_engine(
-        f"sqlite:///{_sim_path(sim_name)}",
-        connect_args={"check_same_thread": False},
-    )
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _get_engine(sim_name: str) -> Engine:
+    """Return the cached engine for a simulation, creating it on first use."""
+    engine = _ENGINES.get(sim_name)
+    if engine is not None:
+        return engine
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(sim_name)
+        if engine is None:
+            # mode=rw never creates the file, so opening it doubles as the
+            # existence check.  The QueuePool reuses connections across
+            # request threads (hence check_same_thread=False), which keeps
+            # SQLite's page cache warm and runs the PRAGMAs only once per
+            # connection.  Each connection may hold a 20 MB page cache and
+            # writers serialize on the file anyway, so overflow is capped
+            # below the default 10.
+            engine = create_engine(
+                URL.create(
+                    "sqlite",
+                    database=f"file:{quote(_sim_path(sim_name))}",
+                    query={"mode": "rw", "uri": "true"},
+                ),
+                connect_args={"check_same_thread": False},
+                pool_size=_POOL_SIZE,
+                max_overflow=_POOL_MAX_OVERFLOW,
+            )
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+            try:
+                _migrate(engine)
+            except OperationalError as exc:
+                engine.dispose()
+                if not os.path.isfile(_sim_path(sim_name)):
+                    raise SimulationNotFound(sim_name) from exc
+                raise
+            _ENGINES[sim_name] = engine
+            _SESSION_FACTORIES[sim_name] = sessionmaker(bind=engine, expire_on_commit=False)
+        return engine
+
+
+def _get_session_factory(sim_name: str) -> sessionmaker:
+    factory = _SESSION_FACTORIES.get(sim_name)
+    if factory is None:
+        _get_engine(sim_name)
+        factory = _SESSION_FACTORIES[sim_name]
+    return factory
+
+
+def _dispose_engine(sim_name: str) -> None:
+    """Drop a simulation's cached engine and close its pooled connections."""
+    with _ENGINES_LOCK:
+        engine = _ENGINES.pop(sim_name, None)
+        _SESSION_FACTORIES.pop(sim_name, None)
+    with _ENSURE_LOCK:
+        _ENSURED_SIMS.discard(sim_name)
+    if engine is not None:
+        engine.dispose()
+
+
+@atexit.register
+def dispose_all_engines() -> None:
+    for sim_name in list(_ENGINES):
+        _dispose_engine(sim_name)
 
 
 @contextmanager
 def get_session(sim_name: str):
-    """Create a throwaway engine + session, yield it, then tear everything down."""
-    engine = _make_engine(sim_name)
-    session: Session = sessionmaker(bind=engine)()
+    """Yield a session bound to the simulation's cached engine; commit on success."""
+    # A new session per call, never a thread-local one: a suspended
+    # streaming response holds its session open while the same thread may
+    # serve other requests.
+    session: Session = _get_session_factory(sim_name)()
     try:
         yield session
         session.commit()
+    except OperationalError as exc:
+        session.rollback()
+        # The file was removed behind a cached engine's back.
+        if not os.path.isfile(_sim_path(sim_name)):
+            _dispose_engine(sim_name)
+            raise SimulationNotFound(sim_name) from exc
+        raise
     except Exception:
         session.rollback()
         raise
     finally:
         session.close()
-        engine.dispose()
 
 
 def create_simulation(sim_name: str, start_date: str | None = None, end_date: str | None = None) -> None:
-    """Create a new SQLite file with all tables, optionally with date range metadata."""
-    engine = _make_engine(sim_name)
-    Base.metadata.create_all(engine)
-    if start_date or end_date:
-        session: Session = sessionmaker(bind=engine)()
-        try:
-            meta = SimulationMetadata(
-                start_datetime=datetime.fromisoformat(start_date) if start_date else datetime.now(timezone.utc),
-                end_datetime=datetime.fromisoformat(end_date) if end_date else datetime.now(timezone.utc),
-            )
-            session.add(meta)
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
-        finally:
-            session.close()
-    engine.dispose()
+    """Create a new SQLite file with all tables, optionally with date range metadata.
+
+    Raises FileExistsError if the simulation already exists.
+    """
+    # Exclusive create: an empty file is a valid empty SQLite database.
+    open(_sim_path(sim_name), "xb").close()
+    _invalidate_list_cache()
+    engine = _get_engine(sim_name)
+    with engine.begin() as conn:
+        # The file was just created empty, so skip create_all's table probes.
+        Base.metadata.create_all(conn, checkfirst=False)
+        if start_date or end_date:
+            now = datetime.now(timezone.utc)
+            conn.execute(insert(SimulationMetadata), [{
+                "start_datetime": datetime.fromisoformat(start_date) if start_date else now,
+                "end_datetime": datetime.fromisoformat(end_date) if end_date else now,
+            }])
 
 
 def simulation_exists(sim_name: str) -> bool:
+    if sim_name in _scan_simulations()[2]:
+        return True
+    # A miss may just be a scan within the same mtime tick; confirm on disk.
     return os.path.isfile(_sim_path(sim_name))
 
 
 def list_simulations() -> list[str]:
-    """Return sorted simulation names (without the .db extension)."""
-    return sorted(
-        f[:-3]
-        for f in os.listdir(DATA_DIR)
-        if f.endswith(".db") and os.path.isfile(os.path.join(DATA_DIR, f))
-    )
+    """Return sorted simulation names (without the .db extension).
+
+    The scan is cached until DATA_DIR's mtime changes, so repeat calls cost
+    a single stat.
+    """
+    return _scan_simulations()[1]
+
+
+def _scan_simulations() -> tuple[int, list[str], frozenset[str]]:
+    global _LIST_CACHE
+    mtime = os.stat(DATA_DIR).st_mtime_ns
+    cache = _LIST_CACHE
+    if cache is not None and cache[0] == mtime:
+        return cache
+    with os.scandir(DATA_DIR) as it:
+        names = sorted(e.name[:-3] for e in it if e.name.endswith(".db") and e.is_file())
+    cache = _LIST_CACHE = (mtime, names, frozenset(names))
+    return cache
+
+
+def _invalidate_list_cache() -> None:
+    # mtime alone can miss a change made within the filesystem's timestamp
+    # granularity, so our own create/delete paths drop the cache explicitly.
+    global _LIST_CACHE
+    _LIST_CACHE = None
 
 
 def ensure_tables(sim_name: str) -> None:
-    """Ensure all ORM tables exist in the given simulation DB (idempotent)."""
-    engine = _make_engine(sim_name)
-    Base.metadata.create_all(engine)
-    engine.dispose()
+    """Ensure all ORM tables exist in the given simulation DB (idempotent).
+
+    Only the first call per simulation touches the database; later calls are a
+    set lookup.
+    """
+    if sim_name in _ENSURED_SIMS:
+        return
+    with _ENSURE_LOCK:
+        if sim_name in _ENSURED_SIMS:
+            return
+        engine = _get_engine(sim_name)
+        # Indexes on existing tables are kept current by _migrate(), which
+        # _get_engine() has already run.
+        Base.metadata.create_all(engine)
+        _ENSURED_SIMS.add(sim_name)
 
 
 def delete_simulation(sim_name: str) -> None:
+    _dispose_engine(sim_name)
     path = _sim_path(sim_name)
-    if os.path.isfile(path):
-        os.remove(path)
+    for p in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.isfile(p):
+            os.remove(p)
+    _invalidate_list_cache()
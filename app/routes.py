@@ -1,39 +1,52 @@
 """Schemas and API routes."""
 
-from datetime import datetime
-
-from flask import Blueprint, jsonify, request
-from pydantic import BaseModel, ConfigDict
+import itertools
+import re
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Annotated
+
+import orjson
+from flask import Blueprint, current_app, jsonify, request
+from pydantic import AfterValidator, BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import delete, exists, select, update
+from werkzeug.exceptions import BadRequest
 
 from app.database import (
     Account,
     FundingRule,
     BalanceEntry,
     SimulationMetadata,
+    SimulationNotFound,
+    bulk_insert_balance_entries,
     create_simulation,
     delete_simulation,
     ensure_tables,
+    from_minor_units,
     get_session,
     list_simulations,
     simulation_exists,
+    to_minor_units,
+    to_naive_et,
 )
-from app.simulation import ManualEntry, SimulationRunner
+from app.simulation import _RULE_COLUMNS, ManualEntry, SimulationRunner
 
 # ------------------------------------------------------------------
 # Schemas
 # ------------------------------------------------------------------
 
 
+# Simulation times are naive ET; aware inputs are converted so they compare
+# with the stored ones.
+_SimulationDatetime = Annotated[datetime, AfterValidator(to_naive_et)]
+
+
 class SimulationCreate(BaseModel):
     name: str
     start_date: str | None = None
     end_date: str | None = None
 
 
-class SimulationList(BaseModel):
-    simulations: list[str]
-
-
 class AccountCreate(BaseModel):
     name: str
 
@@ -42,17 +55,9 @@ class AccountUpdate(BaseModel):
     name: str | None = None
 
 
-class AccountOut(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
-
-    id: int
-    name: str
-    created_at: datetime
-
-
 class MetadataUpdate(BaseModel):
-    start_date: str | None = None
-    end_date: str | None = None
+    start_date: _SimulationDatetime | None = None
+    end_date: _SimulationDatetime | None = None
 
 
 class FundingRuleCreate(BaseModel):
@@ -65,36 +70,23 @@ class FundingRuleCreate(BaseModel):
     target_amount: float = 0.0
 
 
-class FundingRuleOut(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
-
-    id: int
-    rule_type: str
-    target_account_id: int
-    source_account_id: int
-    time_of_day: str
-    currency: str
-    threshold: float
-    target_amount: float
-    description: str
-
-
 class BalanceEntryCreate(BaseModel):
-    amount: float
+    amount: Decimal
     currency: str
     description: str | None = None
-    effective_time: str
+    effective_time: _SimulationDatetime
 
 
-class BalanceEntryOut(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
+_TIME_OF_DAY_RE = re.compile(r"([01]\d|2[0-3]):[0-5]\d:[0-5]\d")
 
-    id: int
-    account_id: int
-    amount: float
-    currency: str
-    description: str | None
-    effective_time: datetime
+# Request-body validators, built once at import so each request goes straight
+# from raw bytes to the compiled pydantic-core validator.
+_SIM_CREATE_ADAPTER = TypeAdapter(SimulationCreate)
+_METADATA_UPDATE_ADAPTER = TypeAdapter(MetadataUpdate)
+_ACCOUNT_CREATE_ADAPTER = TypeAdapter(AccountCreate)
+_ACCOUNT_UPDATE_ADAPTER = TypeAdapter(AccountUpdate)
+_FUNDING_RULE_CREATE_ADAPTER = TypeAdapter(FundingRuleCreate)
+_ENTRY_CREATE_ADAPTER = TypeAdapter(BalanceEntryCreate)
 
 
 # ------------------------------------------------------------------
@@ -104,29 +96,166 @@ class BalanceEntryOut(BaseModel):
 bp = Blueprint("api", __name__)
 
 
-def _ensure_sim(sim_name: str):
-    if not simulation_exists(sim_name):
-        return jsonify({"error": f"Simulation '{sim_name}' not found"}), 404
-    return None
+def _validate_body(adapter: TypeAdapter):
+    """Parse and validate the raw request body in a single pydantic-core pass.
+
+    Bytes that are not JSON at all stay a 400; schema errors raise
+    ValidationError for the app's 422 handler.
+    """
+    try:
+        return adapter.validate_json(request.get_data(cache=False))
+    except ValidationError as exc:
+        errors = exc.errors()
+        if errors[0]["type"] == "json_invalid":
+            raise BadRequest(f"Invalid JSON body: {errors[0]['msg']}") from exc
+        raise
+
+
+def _entries_stmt(account_id: int, limit: int | None = None, after_id: int | None = None):
+    """Select an account's entries as lightweight column rows, not ORM objects.
+
+    ``after_id``/``limit`` page through the list by keyset on
+    (effective_time, id), the same order the list is returned in.
+    """
+    stmt = (
+        select(
+            BalanceEntry.id,
+            BalanceEntry.account_id,
+            BalanceEntry.major_amount.label("amount"),
+            BalanceEntry.currency,
+            BalanceEntry.description,
+            BalanceEntry.effective_time,
+        )
+        .where(BalanceEntry.account_id == account_id)
+        .order_by(BalanceEntry.effective_time, BalanceEntry.id)
+    )
+    if after_id is not None:
+        after_time = (
+            select(BalanceEntry.effective_time)
+            .where(BalanceEntry.id == after_id, BalanceEntry.account_id == account_id)
+            .scalar_subquery()
+        )
+        stmt = stmt.where(
+            (BalanceEntry.effective_time > after_time)
+            | ((BalanceEntry.effective_time == after_time) & (BalanceEntry.id > after_id))
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+# Outbound serializers. These only ever see rows read back from our own
+# database, so they build the response dicts directly instead of running
+# them through pydantic. Never feed them client input.
+
+
+def _account_to_dict(r) -> dict:
+    return {"id": r.id, "name": r.name, "created_at": r.created_at}
+
+
+def _funding_rule_to_dict(r) -> dict:
+    return {
+        "id": r.id,
+        "rule_type": r.rule_type,
+        "target_account_id": r.target_account_id,
+        "source_account_id": r.source_account_id,
+        "time_of_day": r.time_of_day,
+        "currency": r.currency,
+        "threshold": r.threshold,
+        "target_amount": r.target_amount,
+        "description": r.description,
+    }
+
+
+def _entry_to_dict(r) -> dict:
+    """``r.amount`` must already be in major units (see ``_entries_stmt``)."""
+    return {
+        "id": r.id,
+        "account_id": r.account_id,
+        "amount": r.amount,
+        "currency": r.currency,
+        "description": r.description,
+        "effective_time": r.effective_time,
+    }
+
+
+# Rows fetched (and encoded) per chunk by streamed list responses.
+_STREAM_BATCH = 1000
+
+
+def _row_to_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+def _json_array_chunks(sim_name: str, stmt, to_dict=_row_to_dict, check=None):
+    """Yield ``stmt``'s rows as a JSON array, one encoded batch at a time.
+
+    ``check(session)`` may return an error response; it is yielded instead of
+    the array so ``_streamed_json`` can return it before streaming starts.
+    """
+    with get_session(sim_name) as session:
+        if check is not None:
+            error = check(session)
+            if error is not None:
+                yield error
+                return
+        result = session.execute(stmt.execution_options(yield_per=_STREAM_BATCH))
+        yield b"["
+        sep = b""
+        for batch in result.partitions():
+            yield sep + b",".join(orjson.dumps(to_dict(row)) for row in batch)
+            sep = b","
+        yield b"]"
+
+
+def _streamed_json(chunks):
+    """Turn ``_json_array_chunks`` into a streaming response.
+
+    The generator is run up to its opening bracket here, so a missing
+    simulation, a failed query or a ``check`` error goes through the normal
+    error handling instead of surfacing mid-stream.
+    """
+    head = next(chunks)
+    if not isinstance(head, bytes):
+        chunks.close()
+        return head
+    return current_app.response_class(
+        itertools.chain((head,), chunks), mimetype="application/json"
+    )
+
+
+@bp.errorhandler(SimulationNotFound)
+def _simulation_not_found(exc: SimulationNotFound):
+    return jsonify({"error": f"Simulation '{exc.sim_name}' not found"}), 404
 
 
 # ------------------------------------------------------------------
 # Simulation management
 # ------------------------------------------------------------------
 
+# (names list, encoded body) for GET /simulations. list_simulations() hands
+# back the same list object until the directory scan is refreshed, so an
+# identity check is enough to tell when the bytes are stale.
+_SIM_LIST_BODY: tuple[list[str], bytes] | None = None
+
 
 @bp.route("/simulations", methods=["GET"])
 def list_simulations_route():
+    global _SIM_LIST_BODY
     names = list_simulations()
-    return jsonify(SimulationList(simulations=names).model_dump())
+    cached = _SIM_LIST_BODY
+    if cached is None or cached[0] is not names:
+        cached = _SIM_LIST_BODY = (names, orjson.dumps({"simulations": names}))
+    return current_app.response_class(cached[1], mimetype="application/json")
 
 
 @bp.route("/simulations", methods=["POST"])
 def create_simulation_route():
-    body = SimulationCreate.model_validate(request.get_json())
-    if simulation_exists(body.name):
+    body = _validate_body(_SIM_CREATE_ADAPTER)
+    try:
+        create_simulation(body.name, start_date=body.start_date, end_date=body.end_date)
+    except FileExistsError:
         return jsonify({"error": f"Simulation '{body.name}' already exists"}), 409
-    create_simulation(body.name, start_date=body.start_date, end_date=body.end_date)
     return jsonify({"name": body.name, "message": "created"}), 201
 
 
@@ -145,42 +274,35 @@ def delete_simulation_route(sim_name: str):
 
 @bp.route("/simulations/<sim_name>/metadata", methods=["GET"])
 def get_metadata(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
     with get_session(sim_name) as session:
         meta = session.query(SimulationMetadata).first()
         if not meta:
             return jsonify({"start_date": None, "end_date": None})
         return jsonify({
-            "start_date": meta.start_datetime.isoformat(),
-            "end_date": meta.end_datetime.isoformat(),
+            "start_date": meta.start_datetime,
+            "end_date": meta.end_datetime,
         })
 
 
 @bp.route("/simulations/<sim_name>/metadata", methods=["PATCH"])
 def update_metadata(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    body = MetadataUpdate.model_validate(request.get_json())
+    body = _validate_body(_METADATA_UPDATE_ADAPTER)
     with get_session(sim_name) as session:
         meta = session.query(SimulationMetadata).first()
         if not meta:
-            meta = SimulationMetadata(
-                start_datetime=datetime.fromisoformat(body.start_date) if body.start_date else datetime.utcnow(),
-                end_datetime=datetime.fromisoformat(body.end_date) if body.end_date else datetime.utcnow(),
-            )
+            if body.start_date is None or body.end_date is None:
+                return jsonify({"error": "start_date and end_date are required to create metadata"}), 422
+            meta = SimulationMetadata(start_datetime=body.start_date, end_datetime=body.end_date)
             session.add(meta)
         else:
             if body.start_date is not None:
-                meta.start_datetime = datetime.fromisoformat(body.start_date)
+                meta.start_datetime = body.start_date
             if body.end_date is not None:
-                meta.end_datetime = datetime.fromisoformat(body.end_date)
+                meta.end_datetime = body.end_date
         session.flush()
         return jsonify({
-            "start_date": meta.start_datetime.isoformat(),
-            "end_date": meta.end_datetime.isoformat(),
+            "start_date": meta.start_datetime,
+            "end_date": meta.end_datetime,
         })
 
 
@@ -191,66 +313,70 @@ def update_metadata(sim_name: str):
 
 @bp.route("/simulations/<sim_name>/accounts", methods=["GET"])
 def list_accounts(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    with get_session(sim_name) as session:
-        rows = session.query(Account).order_by(Account.id).all()
-        return jsonify([AccountOut.model_validate(r).model_dump(mode="json") for r in rows])
+    stmt = select(Account.id, Account.name, Account.created_at).order_by(Account.id)
+    return _streamed_json(_json_array_chunks(sim_name, stmt, _account_to_dict))
 
 
 @bp.route("/simulations/<sim_name>/accounts", methods=["POST"])
 def create_account(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    body = AccountCreate.model_validate(request.get_json())
+    body = _validate_body(_ACCOUNT_CREATE_ADAPTER)
     with get_session(sim_name) as session:
         acct = Account(name=body.name)
         session.add(acct)
         session.flush()
-        out = AccountOut.model_validate(acct).model_dump(mode="json")
+        out = _account_to_dict(acct)
     return jsonify(out), 201
 
 
 @bp.route("/simulations/<sim_name>/accounts/<int:account_id>", methods=["GET"])
 def get_account(sim_name: str, account_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
     with get_session(sim_name) as session:
         acct = session.get(Account, account_id)
         if not acct:
             return jsonify({"error": "account not found"}), 404
-        return jsonify(AccountOut.model_validate(acct).model_dump(mode="json"))
+        return jsonify(_account_to_dict(acct))
 
 
 @bp.route("/simulations/<sim_name>/accounts/<int:account_id>", methods=["PATCH"])
 def update_account(sim_name: str, account_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    body = AccountUpdate.model_validate(request.get_json())
+    body = _validate_body(_ACCOUNT_UPDATE_ADAPTER)
+    columns = (Account.id, Account.name, Account.created_at)
+    if body.name is None:
+        stmt = select(*columns).where(Account.id == account_id)
+    else:
+        # One UPDATE ... RETURNING instead of load, modify, flush.
+        stmt = (
+            update(Account)
+            .where(Account.id == account_id)
+            .values(name=body.name)
+            .returning(*columns)
+            .execution_options(synchronize_session=False)
+        )
     with get_session(sim_name) as session:
-        acct = session.get(Account, account_id)
-        if not acct:
+        acct = session.execute(stmt).first()
+        if acct is None:
             return jsonify({"error": "account not found"}), 404
-        if body.name is not None:
-            acct.name = body.name
-        session.flush()
-        return jsonify(AccountOut.model_validate(acct).model_dump(mode="json"))
+        return jsonify(_account_to_dict(acct))
 
 
 @bp.route("/simulations/<sim_name>/accounts/<int:account_id>", methods=["DELETE"])
 def delete_account(sim_name: str, account_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
+    in_use = exists().where(
+        (FundingRule.target_account_id == account_id)
+        | (FundingRule.source_account_id == account_id)
+    )
+    # Check and delete in one statement, so a rule created concurrently can't
+    # slip in between. Entries go with the account via ON DELETE CASCADE.
+    stmt = (
+        delete(Account)
+        .where(Account.id == account_id, ~in_use)
+        .execution_options(synchronize_session=False)
+    )
     with get_session(sim_name) as session:
-        acct = session.get(Account, account_id)
-        if not acct:
-            return jsonify({"error": "account not found"}), 404
-        session.delete(acct)
+        if session.execute(stmt).rowcount == 0:
+            if session.get(Account, account_id) is None:
+                return jsonify({"error": "account not found"}), 404
+            return jsonify({"error": "Account is used by a funding rule"}), 409
     return jsonify({"message": "deleted"})
 
 
@@ -261,26 +387,17 @@ def delete_account(sim_name: str, account_id: int):
 
 @bp.route("/simulations/<sim_name>/funding-rules", methods=["GET"])
 def list_funding_rules(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
     ensure_tables(sim_name)
     with get_session(sim_name) as session:
-        rows = session.query(FundingRule).order_by(FundingRule.id).all()
-        return jsonify([FundingRuleOut.model_validate(r).model_dump(mode="json") for r in rows])
+        rows = session.execute(select(*_RULE_COLUMNS).order_by(FundingRule.id))
+        return jsonify([_funding_rule_to_dict(r) for r in rows])
 
 
 @bp.route("/simulations/<sim_name>/funding-rules", methods=["POST"])
 def create_funding_rule(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    body = FundingRuleCreate.model_validate(request.get_json())
+    body = _validate_body(_FUNDING_RULE_CREATE_ADAPTER)
 
-    # Validate time format
-    try:
-        datetime.strptime(body.time_of_day, "%H:%M:%S")
-    except ValueError:
+    if not _TIME_OF_DAY_RE.fullmatch(body.time_of_day):
         return jsonify({"error": "time_of_day must be in HH:MM:SS format"}), 422
 
     if body.rule_type not in ("BACKUP_FUNDING", "TOPUP", "SWEEP_OUT"):
@@ -325,32 +442,31 @@ def create_funding_rule(sim_name: str):
         session.add(rule)
         session.flush()
 
-        # Run simulation with all backup funding rules
-        meta = session.query(SimulationMetadata).first()
-        if meta:
-            runner = SimulationRunner(meta.start_datetime, meta.end_datetime, session)
-            runner.simulate(session)
+        # Run simulation with all backup funding rules. Clients adding several
+        # rules can pass ?defer_simulate=1 and POST /resimulate once at the end.
+        if not request.args.get("defer_simulate", default=0, type=int):
+            meta = session.query(SimulationMetadata).first()
+            if meta:
+                runner = SimulationRunner(meta.start_datetime, meta.end_datetime, session)
+                runner.simulate(session)
 
-        return jsonify(FundingRuleOut.model_validate(rule).model_dump(mode="json")), 201
+        return jsonify(_funding_rule_to_dict(rule)), 201
 
 
 @bp.route("/simulations/<sim_name>/funding-rules/<int:rule_id>", methods=["DELETE"])
 def delete_funding_rule(sim_name: str, rule_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
     with get_session(sim_name) as session:
         rule = session.get(FundingRule, rule_id)
         if not rule:
             return jsonify({"error": "Funding rule not found"}), 404
 
-        session.delete(rule)
-        session.flush()
-
-        # Delete balance entries generated by this rule
+        # Delete balance entries generated by this rule, then the rule itself.
+        # No BalanceEntry objects are loaded in this session, so there is
+        # nothing to synchronize and the DELETE goes out as a single statement.
         session.query(BalanceEntry).filter(
             BalanceEntry.rule_id == rule_id
-        ).delete(synchronize_session="fetch")
+        ).delete(synchronize_session=False)
+        session.delete(rule)
         session.flush()
 
         # Re-run simulation to recalculate remaining rules' effects
@@ -362,6 +478,18 @@ def delete_funding_rule(sim_name: str, rule_id: int):
     return jsonify({"message": "deleted"})
 
 
+@bp.route("/simulations/<sim_name>/resimulate", methods=["POST"])
+def resimulate(sim_name: str):
+    ensure_tables(sim_name)
+    with get_session(sim_name) as session:
+        meta = session.query(SimulationMetadata).first()
+        if not meta:
+            return jsonify({"error": "Simulation metadata not set"}), 422
+        runner = SimulationRunner(meta.start_datetime, meta.end_datetime, session)
+        ids = runner.simulate(session)
+    return jsonify({"message": "resimulated", "entries_created": len(ids)})
+
+
 # ------------------------------------------------------------------
 # Balance entries
 # ------------------------------------------------------------------
@@ -369,84 +497,91 @@ def delete_funding_rule(sim_name: str, rule_id: int):
 
 @bp.route("/simulations/<sim_name>/activity", methods=["GET"])
 def list_activity(sim_name: str):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    with get_session(sim_name) as session:
-        rows = (
-            session.query(BalanceEntry, Account.name)
-            .join(Account, BalanceEntry.account_id == Account.id)
-            .order_by(BalanceEntry.effective_time, BalanceEntry.account_id, BalanceEntry.id)
-            .all()
+    stmt = (
+        select(
+            BalanceEntry.id,
+            BalanceEntry.account_id,
+            Account.name.label("account_name"),
+            BalanceEntry.major_amount.label("amount"),
+            BalanceEntry.currency,
+            BalanceEntry.description,
+            BalanceEntry.effective_time,
         )
-        result = []
-        for entry, account_name in rows:
-            result.append({
-                "id": entry.id,
-                "account_id": entry.account_id,
-                "account_name": account_name,
-                "amount": entry.amount,
-                "currency": entry.currency,
-                "description": entry.description,
-                "effective_time": entry.effective_time.isoformat(),
-            })
-        return jsonify(result)
+        .join(Account, BalanceEntry.account_id == Account.id)
+        .order_by(BalanceEntry.effective_time, BalanceEntry.account_id, BalanceEntry.id)
+    )
+    return _streamed_json(_json_array_chunks(sim_name, stmt))
 
 
 @bp.route("/simulations/<sim_name>/accounts/<int:account_id>/entries", methods=["GET"])
 def list_entries(sim_name: str, account_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    with get_session(sim_name) as session:
-        acct = session.get(Account, account_id)
-        if not acct:
+    limit = request.args.get("limit", type=int)
+    after_id = request.args.get("after_id", type=int)
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be a positive integer"}), 422
+
+    def check(session):
+        if not session.get(Account, account_id):
             return jsonify({"error": "account not found"}), 404
-        entries = (
-            session.query(BalanceEntry)
-            .filter_by(account_id=account_id)
-            .order_by(BalanceEntry.effective_time, BalanceEntry.id)
-            .all()
-        )
-        return jsonify([BalanceEntryOut.model_validate(e).model_dump(mode="json") for e in entries])
+        # An unknown cursor would otherwise page to an empty list, which reads
+        # as the end of the entries.
+        if after_id is not None and session.scalar(
+            select(BalanceEntry.id).where(
+                BalanceEntry.id == after_id, BalanceEntry.account_id == account_id
+            )
+        ) is None:
+            return jsonify({"error": "after_id entry not found"}), 404
+
+    stmt = _entries_stmt(account_id, limit=limit, after_id=after_id)
+    return _streamed_json(_json_array_chunks(sim_name, stmt, _entry_to_dict, check=check))
 
 
 @bp.route("/simulations/<sim_name>/accounts/<int:account_id>/entries", methods=["POST"])
 def create_entry(sim_name: str, account_id: int):
-    err = _ensure_sim(sim_name)
-    if err:
-        return err
-    body = BalanceEntryCreate.model_validate(request.get_json())
+    body = _validate_body(_ENTRY_CREATE_ADAPTER)
     with get_session(sim_name) as session:
         acct = session.get(Account, account_id)
         if not acct:
             return jsonify({"error": "account not found"}), 404
 
-        # Get simulation metadata for the runner
         meta = session.query(SimulationMetadata).first()
-        start_dt = meta.start_datetime if meta else datetime.utcnow()
-        end_dt = meta.end_datetime if meta else datetime.utcnow()
 
         propagator = ManualEntry(
             account_id=account_id,
-            amount=body.amount,
+            amount=to_minor_units(body.amount, body.currency),
             currency=body.currency,
-            timestamp=datetime.fromisoformat(body.effective_time),
+            timestamp=body.effective_time,
             description=body.description or "Manual entry",
         )
 
-        runner = SimulationRunner(start_dt, end_dt, session)
-        runner.add_propagator(propagator)
-        runner.simulate(session)
-
-        # Return updated entry list
-        entries = (
-            session.query(BalanceEntry)
-            .filter_by(account_id=account_id)
-            .order_by(BalanceEntry.effective_time, BalanceEntry.id)
-            .all()
+        if meta:
+            # Planning only reads; SQLite's write lock is taken by apply() alone.
+            runner = SimulationRunner(meta.start_datetime, meta.end_datetime, session)
+            runner.add_propagator(propagator)
+            rows = runner.plan(session)
+            ids = runner.apply(session, rows)
+        else:
+            # No simulation window, so no rules to trigger: record the entry as-is.
+            rows = propagator.propagate(None)
+            ids = bulk_insert_balance_entries(session, rows)
+
+        # Only this account's new rows; the client merges them into its list.
+        created = sorted(
+            (
+                {
+                    "id": entry_id,
+                    "account_id": row["account_id"],
+                    "amount": from_minor_units(row["amount"], row["currency"]),
+                    "currency": row["currency"],
+                    "description": row["description"],
+                    "effective_time": row["effective_time"],
+                }
+                for entry_id, row in zip(ids, rows)
+                if row["account_id"] == account_id
+            ),
+            key=lambda e: (e["effective_time"], e["id"]),
         )
-        return jsonify([BalanceEntryOut.model_validate(e).model_dump(mode="json") for e in entries]), 201
+        return jsonify(created), 201
 
 
 # ------------------------------------------------------------------
@@ -458,39 +593,52 @@ def create_entry(sim_name: str, account_id: int):
 def seed_demo_data():
     sim_name = "demo"
     n = 1
-    while simulation_exists(sim_name):
-        sim_name = f"demo ({n})"
-        n += 1
-    create_simulation(sim_name, start_date="2026-01-06T00:00:00", end_date="2026-01-10T23:59:59")
+    while True:
+        try:
+            create_simulation(sim_name, start_date="2026-01-06T00:00:00", end_date="2026-01-10T23:59:59")
+            break
+        except FileExistsError:
+            sim_name = f"demo ({n})"
+            n += 1
 
     with get_session(sim_name) as session:
-        # Create accounts
-        acct_ramp = Account(name="RAMP_JPM")
-        acct_citi = Account(name="CITI_JPM")
-        acct_hub = Account(name="INCREASE_HUB")
-        acct_saas = Account(name="INCREASE_SAAS")
-        acct_reimb = Account(name="INCREASE_REIMB")
+        # Create accounts, stamped with one shared creation time
+        now = datetime.now(timezone.utc)
+        acct_ramp = Account(name="RAMP_JPM", created_at=now)
+        acct_citi = Account(name="CITI_JPM", created_at=now)
+        acct_hub = Account(name="INCREASE_HUB", created_at=now)
+        acct_saas = Account(name="INCREASE_SAAS", created_at=now)
+        acct_reimb = Account(name="INCREASE_REIMB", created_at=now)
         session.add_all([acct_ramp, acct_citi, acct_hub, acct_saas, acct_reimb])
         session.flush()
 
-        # Initial balances at 2026-01-06 00:00
+        # Initial balances at 2026-01-06 00:00, then simulated activity
         initial_time = datetime(2026, 1, 6, 0, 0, 0)
-        for acct_id, amount, desc in [
-            (acct_ramp.id, 500000.0, "Initial balance"),
-            (acct_citi.id, 50000.0, "Initial balance"),
-            (acct_hub.id, 30000.0, "Initial balance"),
-            (acct_saas.id, 60000.0, "Initial balance"),
-            (acct_reimb.id, 15000.0, "Initial balance"),
-        ]:
-            session.add(BalanceEntry(
-                account_id=acct_id, amount=amount, currency="USD",
-                description=desc, effective_time=initial_time,
-            ))
-        session.flush()
+        entries = [
+            (acct_ramp.id, 500000.0, initial_time, "Initial balance"),
+            (acct_citi.id, 50000.0, initial_time, "Initial balance"),
+            (acct_hub.id, 30000.0, initial_time, "Initial balance"),
+            (acct_saas.id, 60000.0, initial_time, "Initial balance"),
+            (acct_reimb.id, 15000.0, initial_time, "Initial balance"),
+            (acct_citi.id, -60000.0, datetime(2026, 1, 7, 8, 0, 0), "Wire payment - vendor"),
+            (acct_reimb.id, -28000.0, datetime(2026, 1, 7, 8, 0, 0), "Reimbursement payout"),
+            (acct_saas.id, 50000.0, datetime(2026, 1, 8, 7, 0, 0), "SaaS revenue deposit"),
+            (acct_citi.id, -30000.0, datetime(2026, 1, 9, 8, 0, 0), "Wire payment - rent"),
+            (acct_reimb.id, -20000.0, datetime(2026, 1, 9, 8, 0, 0), "Reimbursement batch"),
+            (acct_saas.id, 40000.0, datetime(2026, 1, 10, 7, 0, 0), "SaaS revenue deposit"),
+        ]
+        bulk_insert_balance_entries(session, [
+            {
+                "account_id": acct_id, "amount": to_minor_units(amount, "USD"), "currency": "USD",
+                "description": desc, "effective_time": eff_time,
+            }
+            for acct_id, amount, eff_time, desc in entries
+        ])
 
         # Funding rules
         type_labels = {"TOPUP": "Topup", "SWEEP_OUT": "Sweep Out", "BACKUP_FUNDING": "Backup Funding"}
         acct_by_id = {a.id: a for a in [acct_ramp, acct_citi, acct_hub, acct_saas, acct_reimb]}
+        rules = []
         for rd in [
             {"rule_type": "BACKUP_FUNDING", "target_account_id": acct_citi.id,
              "source_account_id": acct_ramp.id, "time_of_day": "17:00:00",
@@ -506,22 +654,8 @@ def seed_demo_data():
              "currency": "USD", "threshold": 80000.0, "target_amount": 50000.0},
         ]:
             rd["description"] = f"{acct_by_id[rd['source_account_id']].name} -> {acct_by_id[rd['target_account_id']].name} {type_labels[rd['rule_type']]}"
-            session.add(FundingRule(**rd))
-        session.flush()
-
-        # Simulated activity
-        for acct_id, amount, eff_time, desc in [
-            (acct_citi.id, -60000.0, datetime(2026, 1, 7, 8, 0, 0), "Wire payment - vendor"),
-            (acct_reimb.id, -28000.0, datetime(2026, 1, 7, 8, 0, 0), "Reimbursement payout"),
-            (acct_saas.id, 50000.0, datetime(2026, 1, 8, 7, 0, 0), "SaaS revenue deposit"),
-            (acct_citi.id, -30000.0, datetime(2026, 1, 9, 8, 0, 0), "Wire payment - rent"),
-            (acct_reimb.id, -20000.0, datetime(2026, 1, 9, 8, 0, 0), "Reimbursement batch"),
-            (acct_saas.id, 40000.0, datetime(2026, 1, 10, 7, 0, 0), "SaaS revenue deposit"),
-        ]:
-            session.add(BalanceEntry(
-                account_id=acct_id, amount=amount, currency="USD",
-                description=desc, effective_time=eff_time,
-            ))
+            rules.append(FundingRule(**rd))
+        session.add_all(rules)
         session.flush()
 
         # Run simulation
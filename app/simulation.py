@@ -1,28 +1,155 @@
 """Simulation engine: propagators and runner."""
 
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
 from datetime import datetime, timedelta
-from typing import NamedTuple
-from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import count, product
+from weakref import WeakKeyDictionary
 
-from app.database import FundingRule, BalanceEntry, get_balance, get_balance_at_timestamp
+from sqlalchemy import func, null, select, union_all
 
+from app.database import (
+    BalanceEntry,
+    FundingRule,
+    bulk_insert_balance_entries,
+    to_minor_units,
+)
 
-class ListeningPoint(NamedTuple):
-    account_id: int
-    timestamp: datetime
 
+class _Timeline:
+    __slots__ = ("opening", "times", "running")
+
+    def __init__(self, opening, times, running):
+        self.opening = opening  # sum of entries at or before the ledger start
+        self.times = times      # sorted effective times after the ledger start
+        self.running = running  # balance just after each of times
+
+
+# How long after a rule fires its wires land.
+FUNDING_OFFSET = timedelta(minutes=30)
+
+# (account, currency) pairs per priming query; each pair binds at most four
+# parameters, which keeps a batch well under SQLite's variable limit.
+_PRIME_BATCH = 200
+
+
+class BalanceLedger:
+    """In-memory balances for one simulation run.
+
+    Each (account, currency) timeline is read from the database when the
+    runner primes it, or else the first time it is needed; rows planned
+    during the run are recorded here, so propagators see each other's output
+    without writing to the database.
+    """
+
+    def __init__(self, session, start_datetime):
+        self.session = session
+        self.start_datetime = start_datetime
+        self._timelines: dict[tuple[int, str], _Timeline] = {}
+        self._rule_amounts: dict[tuple[int, str, datetime, int], int] = {}
+
+    def prime(self, keys):
+        """Load the timelines of many (account, currency) pairs in batched queries."""
+        keys = [key for key in dict.fromkeys(keys) if key not in self._timelines]
+        for i in range(0, len(keys), _PRIME_BATCH):
+            self._load(keys[i:i + _PRIME_BATCH])
+
+    def _load(self, keys):
+        key_columns = (BalanceEntry.account_id, BalanceEntry.currency)
+        # Separate IN lists, unlike a row-value IN, let SQLite seek
+        # ix_balance_timeline; pairs that were not asked for are skipped below.
+        in_keys = (
+            BalanceEntry.account_id.in_({account_id for account_id, _ in keys}),
+            BalanceEntry.currency.in_({currency for _, currency in keys}),
+        )
+        later = select(
+            *key_columns, BalanceEntry.effective_time, BalanceEntry.amount, BalanceEntry.rule_id
+        ).where(*in_keys, BalanceEntry.effective_time > self.start_datetime)
+        opening = select(
+            *key_columns, null(), func.sum(BalanceEntry.amount), null()
+        ).where(*in_keys, BalanceEntry.effective_time <= self.start_datetime).group_by(*key_columns)
+        # One round trip: opening balances are the rows with a NULL
+        # effective_time, which SQLite sorts ahead of every real time.
+        stmt = union_all(later, opening).order_by(later.selected_columns.effective_time)
+        timelines = {key: _Timeline(0, [], []) for key in keys}
+        for r in self.session.execute(stmt):
+            key = (r.account_id, r.currency)
+            timeline = timelines.get(key)
+            if timeline is None:
+                continue
+            if r.effective_time is None:
+                timeline.opening = r.amount
+                continue
+            timeline.times.append(r.effective_time)
+            running = timeline.running
+            running.append((running[-1] if running else timeline.opening) + r.amount)
+            if r.rule_id is not None:
+                rule_key = (*key, r.effective_time, r.rule_id)
+                self._rule_amounts[rule_key] = self._rule_amounts.get(rule_key, 0) + r.amount
+        self._timelines.update(timelines)
+
+    def _timeline(self, account_id, currency):
+        key = (account_id, currency)
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            self._load([key])
+            timeline = self._timelines[key]
+        return timeline
+
+    def balance(self, account_id, currency, timestamp):
+        """Sum of the account's entries at or before timestamp (>= the ledger start)."""
+        timeline = self._timeline(account_id, currency)
+        idx = bisect_right(timeline.times, timestamp)
+        return timeline.running[idx - 1] if idx else timeline.opening
+
+    def rule_amount_at(self, account_id, currency, timestamp, rule_id):
+        """Sum of the entries a rule has made on the account at exactly timestamp."""
+        self._timeline(account_id, currency)
+        return self._rule_amounts.get((account_id, currency, timestamp, rule_id), 0)
+
+    def record(self, row):
+        timeline = self._timeline(row["account_id"], row["currency"])
+        effective_time = row["effective_time"]
+        amount = row["amount"]
+        if effective_time <= self.start_datetime:
+            timeline.opening += amount
+            idx = 0
+        else:
+            idx = bisect_right(timeline.times, effective_time)
+            timeline.times.insert(idx, effective_time)
+            timeline.running.insert(idx, (timeline.running[idx - 1] if idx else timeline.opening) + amount)
+            idx += 1
+        # Every later running balance shifts by the new amount. The runner
+        # moves forward in time, so this suffix is usually short.
+        timeline.running[idx:] = [balance + amount for balance in timeline.running[idx:]]
+        if row["rule_id"] is not None:
+            rule_key = (row["account_id"], row["currency"], effective_time, row["rule_id"])
+            self._rule_amounts[rule_key] = self._rule_amounts.get(rule_key, 0) + row["amount"]
+
+
+class Propagator:
+    # Subclasses set ``timestamp``: the time the propagator fires at, which
+    # the runner schedules it by. They declare their attributes in
+    # __slots__, since one instance exists per rule per simulated day.
+    __slots__ = ()
 
-class Propagator(ABC):
-    @abstractmethod
     def listening_points(self):
-        pass
+        """Return (account_id, timestamp) pairs whose balance changes re-fire this propagator."""
+        raise NotImplementedError
+
+    def balance_keys(self):
+        """Return the (account_id, currency) pairs this propagator reads or writes."""
+        raise NotImplementedError
 
-    @abstractmethod
-    def propagate(self, session):
-        pass
+    def propagate(self, ledger):
+        """Return the entry rows this propagator makes given the ledger's balances."""
+        raise NotImplementedError
 
 
 class ManualEntry(Propagator):
+    __slots__ = ("account_id", "amount", "currency", "timestamp", "description")
+
     def __init__(self, account_id, amount, currency, timestamp, description="Manual entry"):
         self.account_id = account_id
         self.amount = amount
@@ -33,21 +160,26 @@ class ManualEntry(Propagator):
     def listening_points(self):
         return []
 
-    def propagate(self, session):
-        balance_entry = BalanceEntry(
-            account_id=self.account_id,
-            amount=self.amount,
-            currency=self.currency,
-            description=self.description,
-            effective_time=self.timestamp,
-        )
-        session.add(balance_entry)
-        session.flush()
+    def balance_keys(self):
+        return [(self.account_id, self.currency)]
 
-        return [balance_entry]
+    def propagate(self, ledger):
+        return [{
+            "account_id": self.account_id,
+            "amount": self.amount,
+            "currency": self.currency,
+            "description": self.description,
+            "effective_time": self.timestamp,
+            "rule_id": None,
+        }]
 
 
 class Topup(Propagator):
+    __slots__ = (
+        "rule_id", "target_account_id", "source_account_id", "currency", "timestamp",
+        "threshold", "target_amount", "description", "funding_timestamp",
+    )
+
     def __init__(self, rule_id, target_account_id, source_account_id, timestamp, currency, threshold, target_amount, description=""):
         self.rule_id = rule_id
         self.target_account_id = target_account_id
@@ -58,14 +190,17 @@ class Topup(Propagator):
         self.target_amount = target_amount
         self.description = description
 
-        self.funding_timestamp = timestamp + timedelta(minutes=30) # Hard-coding 30 mins for wires to land
+        self.funding_timestamp = timestamp + FUNDING_OFFSET
 
     def listening_points(self):
-        return [ListeningPoint(account_id=self.target_account_id, timestamp=self.timestamp)]
+        return [(self.target_account_id, self.timestamp)]
+
+    def balance_keys(self):
+        return [(self.target_account_id, self.currency), (self.source_account_id, self.currency)]
 
-    def propagate(self, session):
-        target_account_balance = get_balance(session, self.target_account_id, self.timestamp, self.currency)
-        prior_topup_amount = get_balance_at_timestamp(session, self.target_account_id, self.funding_timestamp, self.currency, rule_id=self.rule_id)
+    def propagate(self, ledger):
+        target_account_balance = ledger.balance(self.target_account_id, self.currency, self.timestamp)
+        prior_topup_amount = ledger.rule_amount_at(self.target_account_id, self.currency, self.funding_timestamp, self.rule_id)
 
         balance_diff = 0
         if target_account_balance > self.threshold:
@@ -73,34 +208,35 @@ class Topup(Propagator):
         elif target_account_balance < self.threshold:
             balance_diff = self.target_amount - target_account_balance - prior_topup_amount
 
-        if abs(balance_diff) < 1e-9:
+        if balance_diff == 0:
             return []
 
-        source_balance_entry = BalanceEntry(
-            account_id=self.source_account_id,
-            amount=-balance_diff,
-            currency=self.currency,
-            description=self.description,
-            effective_time=self.timestamp,
-            rule_id=self.rule_id,
-        )
-        target_balance_entry = BalanceEntry(
-            account_id=self.target_account_id,
-            amount=balance_diff,
-            currency=self.currency,
-            description=self.description,
-            effective_time=self.funding_timestamp,
-            rule_id=self.rule_id,
-        )
-
-        session.add(source_balance_entry)
-        session.add(target_balance_entry)
-        session.flush()
+        source_balance_entry = {
+            "account_id": self.source_account_id,
+            "amount": -balance_diff,
+            "currency": self.currency,
+            "description": self.description,
+            "effective_time": self.timestamp,
+            "rule_id": self.rule_id,
+        }
+        target_balance_entry = {
+            "account_id": self.target_account_id,
+            "amount": balance_diff,
+            "currency": self.currency,
+            "description": self.description,
+            "effective_time": self.funding_timestamp,
+            "rule_id": self.rule_id,
+        }
 
         return [source_balance_entry, target_balance_entry]
 
 
 class SweepOut(Propagator):
+    __slots__ = (
+        "rule_id", "target_account_id", "source_account_id", "currency", "timestamp",
+        "threshold", "target_amount", "description", "funding_timestamp",
+    )
+
     def __init__(self, rule_id, target_account_id, source_account_id, timestamp, currency, threshold, target_amount, description=""):
         self.rule_id = rule_id
         self.target_account_id = target_account_id
@@ -111,16 +247,19 @@ class SweepOut(Propagator):
         self.target_amount = target_amount
         self.description = description
 
-        self.funding_timestamp = timestamp + timedelta(minutes=30)
+        self.funding_timestamp = timestamp + FUNDING_OFFSET
 
     def listening_points(self):
-        return [ListeningPoint(account_id=self.source_account_id, timestamp=self.timestamp)]
+        return [(self.source_account_id, self.timestamp)]
+
+    def balance_keys(self):
+        return [(self.target_account_id, self.currency), (self.source_account_id, self.currency)]
 
-    def propagate(self, session):
-        source_balance = get_balance(session, self.source_account_id, self.timestamp, self.currency)
+    def propagate(self, ledger):
+        source_balance = ledger.balance(self.source_account_id, self.currency, self.timestamp)
         # prior_sweep_amount is negative (debit entries on source) or zero
-        prior_sweep_amount = get_balance_at_timestamp(
-            session, self.source_account_id, self.funding_timestamp, self.currency, rule_id=self.rule_id
+        prior_sweep_amount = ledger.rule_amount_at(
+            self.source_account_id, self.currency, self.funding_timestamp, self.rule_id
         )
 
         balance_diff = 0
@@ -131,96 +270,183 @@ class SweepOut(Propagator):
         elif source_balance < self.threshold:
             balance_diff = -prior_sweep_amount
 
-        if abs(balance_diff) < 1e-9:
+        if balance_diff == 0:
             return []
 
-        source_balance_entry = BalanceEntry(
-            account_id=self.source_account_id,
-            amount=balance_diff,
-            currency=self.currency,
-            description=self.description,
-            effective_time=self.funding_timestamp,
-            rule_id=self.rule_id,
-        )
-        target_balance_entry = BalanceEntry(
-            account_id=self.target_account_id,
-            amount=-balance_diff,
-            currency=self.currency,
-            description=self.description,
-            effective_time=self.funding_timestamp,
-            rule_id=self.rule_id,
+        source_balance_entry = {
+            "account_id": self.source_account_id,
+            "amount": balance_diff,
+            "currency": self.currency,
+            "description": self.description,
+            "effective_time": self.funding_timestamp,
+            "rule_id": self.rule_id,
+        }
+        target_balance_entry = {
+            "account_id": self.target_account_id,
+            "amount": -balance_diff,
+            "currency": self.currency,
+            "description": self.description,
+            "effective_time": self.funding_timestamp,
+            "rule_id": self.rule_id,
+        }
+
+        return [source_balance_entry, target_balance_entry]
+
+
+# Columns that fully determine a rule's scheduled propagators.
+_RULE_COLUMNS = (
+    FundingRule.id,
+    FundingRule.rule_type,
+    FundingRule.target_account_id,
+    FundingRule.source_account_id,
+    FundingRule.time_of_day,
+    FundingRule.currency,
+    FundingRule.threshold,
+    FundingRule.target_amount,
+    FundingRule.description,
+)
+
+
+# Propagator for each rule_type. Backup funding is a Topup whose threshold
+# and target are zeroed when the rule is created.
+_RULE_CLASSES = {"TOPUP": Topup, "BACKUP_FUNDING": Topup, "SWEEP_OUT": SweepOut}
+
+
+@lru_cache(maxsize=None)
+def _parse_time(time_of_day):
+    # Rules commonly share a handful of times of day.
+    return datetime.strptime(time_of_day, "%H:%M:%S").time()
+
+
+# Latest rule expansion per simulation engine, as ((start, end, rules),
+# propagators). Any rule or window change makes an older expansion dead, so
+# only one is kept per simulation, and it is dropped along with the engine.
+_EXPANSIONS = WeakKeyDictionary()
+
+
+def _expand_rules(start_datetime, end_datetime, rules):
+    """Schedule one propagator per rule per day inside the window.
+
+    ``rules`` is a tuple of ``_RULE_COLUMNS`` value tuples.
+    """
+    # Everything but the date is fixed per rule, so parse it once up front.
+    parsed = [
+        (
+            _RULE_CLASSES[rule_type],
+            _parse_time(time_of_day),
+            {
+                "rule_id": rule_id,
+                "target_account_id": target_account_id,
+                "source_account_id": source_account_id,
+                "currency": currency,
+                "threshold": to_minor_units(threshold, currency),
+                "target_amount": to_minor_units(target_amount, currency),
+                "description": description,
+            },
         )
+        for (rule_id, rule_type, target_account_id, source_account_id,
+             time_of_day, currency, threshold, target_amount, description) in rules
+        if rule_type in _RULE_CLASSES
+    ]
+    first_date = start_datetime.date()
+    dates = [
+        first_date + timedelta(days=n)
+        for n in range((end_datetime.date() - first_date).days + 1)
+    ]
 
-        session.add(source_balance_entry)
-        session.add(target_balance_entry)
-        session.flush()
+    propagators = []
+    for current_date, (cls, t, kwargs) in product(dates, parsed):
+        timestamp = datetime.combine(current_date, t)
+        if start_datetime <= timestamp <= end_datetime:
+            propagators.append(cls(timestamp=timestamp, **kwargs))
 
-        return [source_balance_entry, target_balance_entry]
+    return tuple(propagators)
 
 
 class SimulationRunner:
     def __init__(self, start_datetime, end_datetime, session):
         self.start_datetime = start_datetime
         self.end_datetime = end_datetime
+        # Heap of (timestamp, seq, propagator): propagators fire in time
+        # order, ties in the order they were queued.
         self.processing_queue = []
+        self._queue_seq = count()
         self.listeners = dict()
+        # Propagators currently waiting in processing_queue. One that is
+        # already queued will see every entry recorded before it runs, so
+        # enqueueing it again would only repeat the same work.
+        self._pending = set()
 
-        rules = session.query(FundingRule).all()
-        current_date = start_datetime.date()
-        end_date = end_datetime.date()
-
-        while current_date <= end_date:
-            for rule in rules:
-                t = datetime.strptime(rule.time_of_day, "%H:%M:%S").time()
-                timestamp = datetime.combine(current_date, t)
-                if start_datetime <= timestamp <= end_datetime:
-                    if rule.rule_type in ("TOPUP", "BACKUP_FUNDING"):
-                        propagator = Topup(
-                            rule_id=rule.id,
-                            target_account_id=rule.target_account_id,
-                            source_account_id=rule.source_account_id,
-                            timestamp=timestamp,
-                            currency=rule.currency,
-                            threshold=rule.threshold,
-                            target_amount=rule.target_amount,
-                            description=rule.description,
-                        )
-                    elif rule.rule_type == "SWEEP_OUT":
-                        propagator = SweepOut(
-                            rule_id=rule.id,
-                            target_account_id=rule.target_account_id,
-                            source_account_id=rule.source_account_id,
-                            timestamp=timestamp,
-                            currency=rule.currency,
-                            threshold=rule.threshold,
-                            target_amount=rule.target_amount,
-                            description=rule.description,
-                        )
-                    else:
-                        continue
-                    self.add_propagator(propagator)
-
-            current_date += timedelta(days=1)
-
+        rules = tuple(
+            tuple(row) for row in session.query(*_RULE_COLUMNS).order_by(FundingRule.id)
+        )
+        # Propagators hold no per-run state, so while the window and the
+        # rule definitions are unchanged the last expansion is reused as-is.
+        key = (start_datetime, end_datetime, rules)
+        bind = session.get_bind()
+        cached = _EXPANSIONS.get(bind)
+        if cached is None or cached[0] != key:
+            cached = _EXPANSIONS[bind] = (key, _expand_rules(*key))
+        for propagator in cached[1]:
+            self.add_propagator(propagator)
 
     def add_propagator(self, propagator):
-        for listening_point in propagator.listening_points():
-            self.listeners.setdefault(listening_point.account_id, []).append(
-                (listening_point.timestamp, propagator)
-            )
-
-        self.processing_queue.append(propagator)
-
-    def simulate(self, session):
+        # Per account: listener timestamps in sorted order, with the matching
+        # propagators in a parallel list, so plan() can bisect for the
+        # listeners an entry affects.
+        for account_id, timestamp in propagator.listening_points():
+            times, propagators = self.listeners.setdefault(account_id, ([], []))
+            i = bisect_right(times, timestamp)
+            times.insert(i, timestamp)
+            propagators.insert(i, propagator)
+
+        self._enqueue(propagator)
+
+    def _enqueue(self, propagator):
+        if propagator not in self._pending:
+            self._pending.add(propagator)
+            heappush(self.processing_queue, (propagator.timestamp, next(self._queue_seq), propagator))
+
+    def plan(self, session):
+        """Run the propagators against an in-memory ledger; return the rows to insert.
+
+        The session is only read from, so no write lock is taken while planning.
+        """
+        ledger = BalanceLedger(session, self.start_datetime)
+        ledger.prime(
+            key for _, _, propagator in self.processing_queue
+            for key in propagator.balance_keys()
+        )
+        rows = []
         while self.processing_queue:
-            propagator = self.processing_queue.pop(0)
-            new_entries = propagator.propagate(session)
+            _, _, propagator = heappop(self.processing_queue)
+            self._pending.discard(propagator)
+            new_entries = propagator.propagate(ledger)
+            for new_entry in new_entries:
+                ledger.record(new_entry)
+            rows.extend(new_entries)
 
             for new_entry in new_entries:
-                account_listeners = self.listeners.get(new_entry.account_id, [])
-                for timestamp, listener in account_listeners:
-                    if new_entry.effective_time <= timestamp:
-                        self.processing_queue.append(listener)
+                account_listeners = self.listeners.get(new_entry["account_id"])
+                if account_listeners is None:
+                    continue
+                times, propagators = account_listeners
+                # Every listener at or after the entry's time sees a changed
+                # balance. Propagators pop in time order and every listener
+                # starts out queued, so those after the current timestamp
+                # are still pending; only ones up to this instant can need
+                # re-firing.
+                start = bisect_left(times, new_entry["effective_time"])
+                end = bisect_right(times, propagator.timestamp)
+                for listener in propagators[start:end]:
+                    self._enqueue(listener)
+
+        return rows
+
+    def apply(self, session, rows):
+        """Write planned rows in a single bulk INSERT; return their new ids."""
+        return bulk_insert_balance_entries(session, rows)
 
-        return None
+    def simulate(self, session):
+        return self.apply(session, self.plan(session))
 
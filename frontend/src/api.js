@@ -88,6 +88,8 @@ export function listEntries(simName, accountId) {
   return request(`${BASE}/${simName}/accounts/${accountId}/entries`);
 }
 
+// Returns only the entries created on this account (the manual entry plus
+// any rule-generated adjustments); merge them into the current list.
 export function createEntry(simName, accountId, entry) {
   return request(`${BASE}/${simName}/accounts/${accountId}/entries`, {
     method: 'POST',
@@ -4,6 +4,13 @@ import { listEntries, createEntry } from '../api';
 import EntryForm from '../components/EntryForm';
 import EntryTable from '../components/EntryTable';
 
+function compareEntries(a, b) {
+  if (a.effective_time !== b.effective_time) {
+    return a.effective_time < b.effective_time ? -1 : 1;
+  }
+  return a.id - b.id;
+}
+
 export default function AccountLedger() {
   const { simName, accountId } = useParams();
   const [entries, setEntries] = useState([]);
@@ -23,8 +30,8 @@ export default function AccountLedger() {
   async function handleCreate(entry) {
     setError(null);
     try {
-      const updatedEntries = await createEntry(simName, accountId, entry);
-      setEntries(updatedEntries);
+      const created = await createEntry(simName, accountId, entry);
+      setEntries((prev) => [...prev, ...created].sort(compareEntries));
     } catch (e) {
       setError(e.message);
     }